@@ -1,31 +1,175 @@
+import asyncio
+import hashlib
+import json
+import mimetypes
+import mmap
 import os
+import sys
+import threading
 import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from operator import attrgetter
 from pathlib import Path
-from dotenv import load_dotenv
-from google import genai
-from google.genai import types
+from typing import TYPE_CHECKING
+
+# google.genai, httpx and dotenv are imported where first needed to keep module import cheap
+if TYPE_CHECKING:
+    from google import genai
+
+# Connection pool shared by every RPC so repeated calls reuse keep-alive connections
+HTTP_POOL_LIMITS = {
+    'max_connections': 100,
+    'max_keepalive_connections': 50,
+    'keepalive_expiry': 30
+}
+
+# Retry transient failures (408, 429 and 5xx) with exponential backoff from 0.3s,
+# plus up to 1s of random jitter per wait. Applied per call, only to uploads,
+# imports and queries, so non-idempotent calls such as store creation never retry.
+HTTP_RETRY_OPTIONS = {
+    'attempts': 3,
+    'initial_delay': 0.3,
+    'max_delay': 5.0,
+    'exp_base': 2.0,
+    'jitter': 1.0,
+    'http_status_codes': [408, 429, 500, 502, 503, 504]
+}
+RETRY_HTTP_OPTIONS = {'retry_options': HTTP_RETRY_OPTIONS}
+
+# Sidecar mapping store name -> content hash -> imported file name, used to skip re-uploads
+IMPORT_INDEX_PATH = Path(".cache") / "gemini_rag_index.json"
+
+# Files at least this large are hashed through mmap instead of buffered reads
+MMAP_HASH_THRESHOLD = 100 * 1024 * 1024
+
+# Document extensions picked up from the documents directory by main()
+SUPPORTED_EXTENSIONS = {'.txt', '.pdf', '.md'}
+
+# Only these models accept a response schema alongside the File Search tool
+STRUCTURED_OUTPUT_MODEL_PREFIXES = ('gemini-3',)
+
+# Number of recent query responses kept per GeminiRAG instance
+QUERY_CACHE_SIZE = 256
+
+# One client per API key, shared by every GeminiRAG instance in the process.
+# genai.Client is thread-safe, so instances and worker threads can reuse it.
+_CLIENT_CACHE: dict[str, "genai.Client"] = {}
+# Async connections are bound to the event loop that opened them, so async
+# clients are cached per running loop rather than process-wide
+_ASYNC_CLIENT_CACHE: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = (
+    weakref.WeakKeyDictionary()
+)
+_CLIENT_CACHE_LOCK = threading.Lock()
+
+
+def _build_client(api_key: str) -> "genai.Client":
+    """Create a client whose HTTP connections are pooled and kept alive"""
+    import httpx
+    from google import genai
+    from google.genai import types
+
+    limits = httpx.Limits(**HTTP_POOL_LIMITS)
+    return genai.Client(
+        api_key=api_key,
+        http_options=types.HttpOptions(
+            client_args={'limits': limits},
+            async_client_args={'limits': limits}
+        )
+    )
+
+
+def _get_client(api_key: str) -> "genai.Client":
+    """Return the cached client for an API key, creating it on first use"""
+    with _CLIENT_CACHE_LOCK:
+        client = _CLIENT_CACHE.get(api_key)
+        if client is None:
+            client = _build_client(api_key)
+            _CLIENT_CACHE[api_key] = client
+        return client
+
+
+def _get_async_client(api_key: str):
+    """Return the async client for an API key on the running event loop"""
+    loop = asyncio.get_running_loop()
+    with _CLIENT_CACHE_LOCK:
+        # Drop clients of closed loops; their connections can't be reused
+        for closed_loop in [cached for cached in _ASYNC_CLIENT_CACHE if cached.is_closed()]:
+            del _ASYNC_CLIENT_CACHE[closed_loop]
+        clients = _ASYNC_CLIENT_CACHE.setdefault(loop, {})
+        client = clients.get(api_key)
+        if client is None:
+            client = _build_client(api_key)
+            clients[api_key] = client
+        return client.aio
+
+
+_get_source_title = attrgetter('retrieved_context.title')
+
+
+def _safe(getter, obj):
+    """Apply an attribute getter, returning None if any attribute on the path is missing"""
+    try:
+        return getter(obj)
+    except AttributeError:
+        return None
+
+
+def _file_digest(f) -> str:
+    """Return the SHA-256 hex digest of an open binary file without loading it into memory"""
+    if os.fstat(f.fileno()).st_size >= MMAP_HASH_THRESHOLD:
+        # Hash straight from the page cache rather than copying through a buffer
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return hashlib.sha256(mm).hexdigest()
+    return hashlib.file_digest(f, 'sha256').hexdigest()
 
-# Load environment variables
-load_dotenv()
 
 class GeminiRAG:
     """RAG system using Gemini File Search API"""
 
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, index_path: str = IMPORT_INDEX_PATH):
         """Initialize the RAG system with Gemini API"""
         self.api_key = api_key or os.getenv('GEMINI_API_KEY')
+        if not self.api_key:
+            # Load environment variables from .env only when the key isn't already set
+            from dotenv import load_dotenv
+            load_dotenv()
+            self.api_key = os.getenv('GEMINI_API_KEY')
         if not self.api_key:
             raise ValueError("GEMINI_API_KEY not found in environment variables")
 
+        from google.genai import types
+        self._types = types
+
         # Set API key in environment for the client
         os.environ['GOOGLE_API_KEY'] = self.api_key
-        self.client = genai.Client(api_key=self.api_key)
-
-        self.uploaded_files = []
+        self.client = _get_client(self.api_key)
+
+        # Uploaded files keyed by their resource name, e.g. "files/abc-123"
+        self.uploaded_files = {}
+        # Files skipped because identical content was imported by an earlier run.
+        # Their Files API uploads may have expired or been deleted, so they are
+        # tracked apart from uploaded_files and never passed to files.delete.
+        self.reused_files = {}
+        # Guards uploaded_files, reused_files, _cache_version and _query_cache,
+        # which uploads, deletes and queries may touch from several threads
+        self._state_lock = threading.Lock()
+        # Bumped whenever the store contents change so cached answers go stale
+        self._cache_version = 0
+        self._query_cache = OrderedDict()
+        self.index_path = Path(index_path)
+        self._index_lock = threading.Lock()
+        self._import_index = self._load_import_index()
         self.file_search_store = None
         self.model_name = "gemini-2.5-pro"
         print(f"Initialized with model: {self.model_name}")
 
+    @property
+    def _aio(self):
+        """Async client bound to the running event loop"""
+        return _get_async_client(self.api_key)
+
     def create_store(self, store_name: str = "gemini-rag-store"):
         """Create a File Search store"""
         print(f"Creating file search store: {store_name}")
@@ -38,84 +182,521 @@ class GeminiRAG:
         print(f"File search store created: {self.file_search_store.name}")
         return self.file_search_store
 
-    def upload_file(self, file_path: str, metadata: dict = None):
-        """Upload a file to Gemini and import it into the file search store"""
+    def get_or_create_store(self, store_name: str = "gemini-rag-store"):
+        """Reuse the File Search store with this display name, creating it if needed.
+
+        Reusing a store across runs lets unchanged files be skipped via the import index.
+        """
+        try:
+            stores = list(self.client.file_search_stores.list())
+        except Exception as e:
+            print(f"Error listing stores: {e}")
+            return self.create_store(store_name)
+
+        # Forget imports recorded for stores that no longer exist
+        self._prune_import_index({store.name for store in stores})
+
+        for store in stores:
+            if store.display_name == store_name:
+                print(f"Reusing file search store: {store.name}")
+                self.file_search_store = store
+                return store
+        return self.create_store(store_name)
+
+    def _resolve_upload_path(self, file_path: str) -> Path:
+        """Check that a store exists and the file is present before uploading"""
         if not self.file_search_store:
             raise ValueError("No file search store created. Call create_store() first.")
 
         file_path = Path(file_path)
         if not file_path.exists():
             raise FileNotFoundError(f"File not found: {file_path}")
+        return file_path
 
+    def _load_import_index(self) -> dict:
+        """Load the content-hash index of previously imported files"""
+        if not self.index_path.exists():
+            return {}
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Ignoring unreadable import index {self.index_path}: {e}")
+            return {}
+
+    def _save_import_index(self):
+        """Write the import index atomically; caller must hold _index_lock"""
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self._import_index, f, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    def _prune_import_index(self, live_store_names: set):
+        """Drop index entries for stores that have been deleted"""
+        with self._index_lock:
+            stale = [name for name in self._import_index if name not in live_store_names]
+            for name in stale:
+                del self._import_index[name]
+            if stale:
+                self._save_import_index()
+
+    def _find_imported(self, digest: str, display_name: str):
+        """Return the file that content with this hash was already imported as, if any"""
+        with self._index_lock:
+            file_name = self._import_index.get(self.file_search_store.name, {}).get(digest)
+        if file_name is None:
+            return None
+        return self._types.File(name=file_name, display_name=display_name)
+
+    def _remember_import(self, digest: str, uploaded_file):
+        """Record that content with this hash is now imported into the current store"""
+        with self._index_lock:
+            store_index = self._import_index.setdefault(self.file_search_store.name, {})
+            store_index[digest] = uploaded_file.name
+            self._save_import_index()
+
+    def _upload_unless_imported(self, file_path: str):
+        """Upload a file unless identical content is already in the store.
+
+        Returns (digest, file, is_new).
+        """
+        file_path = self._resolve_upload_path(file_path)
+        # Hash and upload from the same handle so the file is only opened once
+        with open(file_path, 'rb') as f:
+            digest = _file_digest(f)
+            existing = self._find_imported(digest, file_path.name)
+            if existing is not None:
+                print(f"Skipping unchanged file already in store: {file_path.name}")
+                return digest, existing, False
+            f.seek(0)
+            return digest, self._upload_only(file_path, f), True
+
+    def _record_reuse(self, existing_file):
+        """Track a file whose content is already imported into the store"""
+        with self._state_lock:
+            self.reused_files[existing_file.name] = existing_file
+
+    def _record_upload(self, uploaded_file):
+        """Track an imported file and invalidate cached query answers"""
+        with self._state_lock:
+            if uploaded_file.name not in self.uploaded_files:
+                self._cache_version += 1
+            self.uploaded_files[uploaded_file.name] = uploaded_file
+
+    def _upload_only(self, file_path: Path, file_obj):
+        """Upload an open file to the Files API without importing it into the store"""
         print(f"Uploading file: {file_path.name}")
 
         # Upload file using the Files API
         # display_name is used for the human-readable filename (no format restrictions)
+        # The SDK can't infer the mime type from a file handle, so guess it from the path
         uploaded_file = self.client.files.upload(
-            file=str(file_path),
-            config={'display_name': file_path.name}
+            file=file_obj,
+            config={
+                'display_name': file_path.name,
+                'mime_type': mimetypes.guess_type(file_path)[0],
+                'http_options': RETRY_HTTP_OPTIONS
+            }
         )
 
         print(f"File uploaded: {uploaded_file.name}")
+        return uploaded_file
+
+    def _import_only(self, uploaded_file):
+        """Start importing an uploaded file into the store and return the pending operation"""
+        return self.client.file_search_stores.import_file(
+            file_search_store_name=self.file_search_store.name,
+            file_name=uploaded_file.name,
+            config={'http_options': RETRY_HTTP_OPTIONS}
+        )
+
+    def _refresh_operation(self, operation):
+        """Fetch an operation's latest state, returning the exception if polling fails"""
+        try:
+            return self.client.operations.get(operation)
+        except Exception as e:
+            return e
+
+    def _wait_for_operations(self, operations: list):
+        """Poll import operations together until all are done.
+
+        An operation that can't be polled is replaced by the exception raised,
+        so one failure doesn't abandon the rest of the batch.
+        """
+        operations = list(operations)
+
+        def pending(operation):
+            return not isinstance(operation, Exception) and not operation.done
+
+        # Back off from 0.2s up to 2s, re-fetching only the operations still pending.
+        # done is checked before the first sleep, so imports that finish immediately never wait
+        delay = 0.2
+        while any(pending(operation) for operation in operations):
+            time.sleep(delay)
+            delay = min(delay * 1.5, 2.0)
+            operations = [
+                self._refresh_operation(operation) if pending(operation) else operation
+                for operation in operations
+            ]
+        return operations
+
+    def _import_error(self, operation):
+        """Return why a finished import failed, or None if it succeeded"""
+        if isinstance(operation, Exception):
+            return operation
+        return operation.error
+
+    def _raise_for_import_error(self, operation, file_path):
+        """Raise if a finished import operation reports a failure"""
+        if isinstance(operation, Exception):
+            raise operation
+        if operation.error:
+            raise RuntimeError(f"Import failed for {Path(file_path).name}: {operation.error}")
+
+    def _discard_upload(self, uploaded_file):
+        """Delete an upload whose import failed, tracking it for delete_files if that fails too"""
+        try:
+            self.client.files.delete(name=uploaded_file.name)
+        except Exception as e:
+            print(f"Error deleting {uploaded_file.name}: {e}")
+            self._record_upload(uploaded_file)
+
+    async def _discard_upload_async(self, uploaded_file):
+        """Async variant of _discard_upload"""
+        try:
+            await self._aio.files.delete(name=uploaded_file.name)
+        except Exception as e:
+            print(f"Error deleting {uploaded_file.name}: {e}")
+            self._record_upload(uploaded_file)
+
+    def upload_file(self, file_path: str, metadata: dict = None):
+        """Upload a file to Gemini and import it into the file search store"""
+        digest, uploaded_file, is_new = self._upload_unless_imported(file_path)
+
+        if is_new:
+            try:
+                # Import the file into the File Search store
+                print("Importing file into search store...")
+                operation = self._import_only(uploaded_file)
+
+                # Wait until import is complete
+                operation, = self._wait_for_operations([operation])
+                self._raise_for_import_error(operation, file_path)
+            except Exception:
+                self._discard_upload(uploaded_file)
+                raise
+
+            print(f"File imported successfully: {Path(file_path).name}")
+            self._remember_import(digest, uploaded_file)
+            self._record_upload(uploaded_file)
+        else:
+            self._record_reuse(uploaded_file)
+        return uploaded_file
+
+    def upload_multiple_files(self, file_paths: list, max_workers: int = 8):
+        """Upload multiple files concurrently"""
+        results = [(file_path, None) for file_path in file_paths]
+        # Uploads are I/O-bound, so share the client across a thread pool
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(self.upload_file, file_path): i
+                for i, file_path in enumerate(file_paths)
+            }
+            for future in as_completed(futures):
+                i = futures[future]
+                file_path = file_paths[i]
+                try:
+                    results[i] = (file_path, future.result())
+                except Exception as e:
+                    print(f"Error uploading {file_path}: {e}")
+        return results
+
+    def upload_and_import_batch(self, file_paths: list, max_workers: int = 8):
+        """Upload files concurrently, then import them all and wait on a single polling loop"""
+        results = [(file_path, None) for file_path in file_paths]
+        digests = {}
+        to_import = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(self._upload_unless_imported, file_path): i
+                for i, file_path in enumerate(file_paths)
+            }
+            for future in as_completed(futures):
+                i = futures[future]
+                file_path = file_paths[i]
+                try:
+                    digest, uploaded_file, is_new = future.result()
+                except Exception as e:
+                    print(f"Error uploading {file_path}: {e}")
+                    continue
+                results[i] = (file_path, uploaded_file)
+                if is_new:
+                    digests[i] = digest
+                    to_import.append(i)
+                else:
+                    self._record_reuse(uploaded_file)
+
+        # The store imports one file per call, so issue every import before polling any of them
+        if to_import:
+            print("Importing files into search store...")
+        pending = []
+        for i in sorted(to_import):
+            file_path, uploaded_file = results[i]
+            try:
+                pending.append((i, self._import_only(uploaded_file)))
+            except Exception as e:
+                print(f"Error importing {file_path}: {e}")
+                self._discard_upload(uploaded_file)
+                results[i] = (file_path, None)
+
+        operations = self._wait_for_operations([operation for _, operation in pending])
+        for (i, _), operation in zip(pending, operations):
+            file_path, uploaded_file = results[i]
+            error = self._import_error(operation)
+            if error:
+                print(f"Error importing {file_path}: {error}")
+                self._discard_upload(uploaded_file)
+                results[i] = (file_path, None)
+                continue
+            print(f"File imported successfully: {Path(file_path).name}")
+            self._remember_import(digests[i], uploaded_file)
+            self._record_upload(uploaded_file)
+        return results
 
-        # Import the file into the File Search store
-        print("Importing file into search store...")
-        operation = self.client.file_search_stores.import_file(
+    async def _import_and_wait_async(self, uploaded_file):
+        """Import an uploaded file into the store and wait without blocking the event loop"""
+        operation = await self._aio.file_search_stores.import_file(
             file_search_store_name=self.file_search_store.name,
-            file_name=uploaded_file.name
+            file_name=uploaded_file.name,
+            config={'http_options': RETRY_HTTP_OPTIONS}
         )
 
-        # Wait until import is complete
+        delay = 0.2
         while not operation.done:
-            time.sleep(2)
-            operation = self.client.operations.get(operation)
+            await asyncio.sleep(delay)
+            delay = min(delay * 1.5, 2.0)
+            operation = await self._aio.operations.get(operation)
+        return operation
+
+    async def _upload_file_async(self, file_path: str):
+        """Async variant of upload_file using the client's aio interface"""
+        file_path = self._resolve_upload_path(file_path)
+
+        # Hash off the event loop so large files don't stall other uploads
+        with open(file_path, 'rb') as f:
+            digest = await asyncio.to_thread(_file_digest, f)
+        existing = self._find_imported(digest, file_path.name)
+        if existing is not None:
+            print(f"Skipping unchanged file already in store: {file_path.name}")
+            self._record_reuse(existing)
+            return existing
+
+        print(f"Uploading file: {file_path.name}")
+        uploaded_file = await self._aio.files.upload(
+            file=str(file_path),
+            config={'display_name': file_path.name, 'http_options': RETRY_HTTP_OPTIONS}
+        )
+        print(f"File uploaded: {uploaded_file.name}")
+
+        try:
+            operation = await self._import_and_wait_async(uploaded_file)
+            self._raise_for_import_error(operation, file_path)
+        except Exception:
+            await self._discard_upload_async(uploaded_file)
+            raise
 
         print(f"File imported successfully: {file_path.name}")
-        self.uploaded_files.append(uploaded_file)
+        self._remember_import(digest, uploaded_file)
+        self._record_upload(uploaded_file)
         return uploaded_file
 
-    def upload_multiple_files(self, file_paths: list):
-        """Upload multiple files"""
+    async def upload_multiple_files_async(self, file_paths: list):
+        """Upload multiple files concurrently on a single event loop"""
+        uploads = await asyncio.gather(
+            *[self._upload_file_async(file_path) for file_path in file_paths],
+            return_exceptions=True
+        )
         results = []
-        for file_path in file_paths:
-            try:
-                result = self.upload_file(file_path)
-                results.append((file_path, result))
-            except Exception as e:
-                print(f"Error uploading {file_path}: {e}")
-                results.append((file_path, None))
+        for file_path, result in zip(file_paths, uploads):
+            if isinstance(result, Exception):
+                print(f"Error uploading {file_path}: {result}")
+                result = None
+            results.append((file_path, result))
         return results
 
-    def query(self, question: str, metadata_filter: str = None):
-        """Query the RAG system using file search"""
+    def _check_ready_to_query(self):
+        """Ensure a store exists and has files before querying"""
         if not self.file_search_store:
             raise ValueError("No file search store created. Call create_store() first.")
 
-        if not self.uploaded_files:
+        if not self.uploaded_files and not self.reused_files:
             raise ValueError("No files uploaded. Call upload_file() first.")
 
+    def _query_config(self, schema=None):
+        """Build the generation config that uses the file search store as a tool"""
+        tools = [
+            self._types.Tool(
+                file_search=self._types.FileSearch(
+                    file_search_store_names=[self.file_search_store.name]
+                )
+            )
+        ]
+        if schema is None:
+            return self._types.GenerateContentConfig(tools=tools, http_options=RETRY_HTTP_OPTIONS)
+
+        # Accept fully qualified names such as "models/gemini-3-pro-preview"
+        model = self.model_name.removeprefix('models/')
+        if not model.startswith(STRUCTURED_OUTPUT_MODEL_PREFIXES):
+            raise ValueError(
+                f"{self.model_name} does not support a response schema with File Search. "
+                "Use a Gemini 3 model (set model_name) or query without a schema."
+            )
+
+        # Constrain the answer to JSON matching the schema
+        return self._types.GenerateContentConfig(
+            tools=tools,
+            response_mime_type="application/json",
+            response_schema=schema,
+            http_options=RETRY_HTTP_OPTIONS
+        )
+
+    def _query_cache_key(self, question: str, metadata_filter: str = None, schema=None):
+        """Key cached answers by store, model, question and store contents version"""
+        # dict schemas aren't hashable, so key them by their canonical JSON
+        if isinstance(schema, dict):
+            schema = json.dumps(schema, sort_keys=True, default=str)
+        return (
+            self.file_search_store.name,
+            self.model_name,
+            question,
+            metadata_filter,
+            schema,
+            self._cache_version
+        )
+
+    def _get_cached_response(self, key):
+        """Return a cached response and mark it as recently used, or None"""
+        with self._state_lock:
+            response = self._query_cache.get(key)
+            if response is not None:
+                self._query_cache.move_to_end(key)
+            return response
+
+    def _cache_response(self, key, response):
+        """Store a response, evicting the least recently used entry when full"""
+        with self._state_lock:
+            self._query_cache[key] = response
+            self._query_cache.move_to_end(key)
+            if len(self._query_cache) > QUERY_CACHE_SIZE:
+                self._query_cache.popitem(last=False)
+
+    def query(self, question: str, metadata_filter: str = None, schema: type | dict = None):
+        """Query the RAG system using file search.
+
+        Pass a schema (a Pydantic model, type or JSON schema dict) to get a JSON answer.
+        Schemas require a Gemini 3 model; other models raise ValueError.
+        """
+        self._check_ready_to_query()
+        # Build the config first so an unsupported schema fails before any output
+        config = self._query_config(schema)
+
         print(f"\nQuery: {question}")
         print("-" * 50)
 
-        # Use the file search store as a tool in the generation call
-        response = self.client.models.generate_content(
+        # Identical questions against unchanged store contents skip the model call
+        cache_key = self._query_cache_key(question, metadata_filter, schema)
+        cached = self._get_cached_response(cache_key)
+        if cached is not None:
+            self._print_response(cached)
+            return cached
+
+        # Use the file search store as a tool in the generation call and
+        # stream the answer so text appears as soon as the first chunk arrives
+        print("\nAnswer:")
+        answer_parts = []
+        grounding = None
+        finish_reason = None
+        usage = None
+        model_version = None
+        prompt_feedback = None
+        has_candidates = False
+        for chunk in self.client.models.generate_content_stream(
             model=self.model_name,
             contents=question,
-            config=types.GenerateContentConfig(
-                tools=[
-                    types.Tool(
-                        file_search=types.FileSearch(
-                            file_search_store_names=[self.file_search_store.name]
-                        )
-                    )
-                ]
+            config=config
+        ):
+            if chunk.text:
+                print(chunk.text, end="", flush=True)
+                answer_parts.append(chunk.text)
+            if chunk.candidates:
+                has_candidates = True
+                candidate = chunk.candidates[0]
+                grounding = candidate.grounding_metadata or grounding
+                finish_reason = candidate.finish_reason or finish_reason
+            # The last chunk may carry only usage metadata and no candidates
+            usage = chunk.usage_metadata or usage
+            model_version = chunk.model_version or model_version
+            prompt_feedback = chunk.prompt_feedback or prompt_feedback
+        print("\n")
+
+        # Rebuild a single response from the streamed chunks so callers
+        # still get the full answer text, grounding metadata and usage.
+        # A blocked prompt yields no candidates but keeps its prompt_feedback.
+        candidates = []
+        if has_candidates:
+            candidates.append(
+                self._types.Candidate(
+                    content=self._types.Content(
+                        role='model',
+                        parts=[self._types.Part(text=''.join(answer_parts))]
+                    ),
+                    grounding_metadata=grounding,
+                    finish_reason=finish_reason
+                )
             )
+        response = self._types.GenerateContentResponse(
+            candidates=candidates,
+            prompt_feedback=prompt_feedback,
+            usage_metadata=usage,
+            model_version=model_version
         )
 
+        if has_candidates:
+            self._cache_response(cache_key, response)
+        self._print_sources(response)
+        return response
+
+    async def query_async(self, question: str, metadata_filter: str = None, schema: type | dict = None):
+        """Async variant of query so several questions can be in flight at once"""
+        self._check_ready_to_query()
+
+        cache_key = self._query_cache_key(question, metadata_filter, schema)
+        response = self._get_cached_response(cache_key)
+        if response is None:
+            response = await self._aio.models.generate_content(
+                model=self.model_name,
+                contents=question,
+                config=self._query_config(schema)
+            )
+            self._cache_response(cache_key, response)
+
+        # Print the question alongside its answer so concurrent output stays grouped
+        print(f"\nQuery: {question}")
+        print("-" * 50)
+        self._print_response(response)
+        return response
+
+    def _print_response(self, response):
+        """Print the answer text and its grounding sources"""
         # Extract and print answer
         answer = response.text
         print(f"\nAnswer:\n{answer}\n")
 
+        self._print_sources(response)
+
+    def _print_sources(self, response):
+        """Print the unique grounding sources cited by a response"""
         # Extract and display grounding sources
         if response.candidates and len(response.candidates) > 0:
             grounding = response.candidates[0].grounding_metadata
@@ -123,21 +704,19 @@ class GeminiRAG:
             if not grounding or not grounding.grounding_chunks:
                 print("No grounding sources found")
             else:
-                # Extract unique sources from grounding chunks
-                sources = set()
-                for chunk in grounding.grounding_chunks:
-                    if hasattr(chunk, 'retrieved_context') and hasattr(chunk.retrieved_context, 'title'):
-                        sources.add(chunk.retrieved_context.title)
+                # Extract unique sources from grounding chunks in the order they are cited
+                sources = dict.fromkeys(
+                    title for chunk in grounding.grounding_chunks
+                    if (title := _safe(_get_source_title, chunk))
+                )
 
                 if sources:
                     print("\nSources:")
-                    for i, source in enumerate(sorted(sources), 1):
+                    for i, source in enumerate(sources, 1):
                         print(f"{i}. {source}")
         else:
             print("No candidate responses found")
 
-        return response
-
     def list_files(self):
         """List all uploaded files"""
         try:
@@ -147,16 +726,27 @@ class GeminiRAG:
             print(f"Error listing files: {e}")
             return []
 
-    def delete_files(self):
-        """Delete all uploaded files"""
-        print(f"Deleting {len(self.uploaded_files)} uploaded files...")
-        for file in self.uploaded_files:
-            try:
-                self.client.files.delete(name=file.name)
-                print(f"Deleted: {file.name}")
-            except Exception as e:
-                print(f"Error deleting {file.name}: {e}")
-        self.uploaded_files = []
+    def delete_files(self, max_workers: int = 16):
+        """Delete all uploaded files concurrently"""
+        with self._state_lock:
+            files = list(self.uploaded_files.values())
+        print(f"Deleting {len(files)} uploaded files...")
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(self.client.files.delete, name=file.name): file
+                for file in files
+            }
+            for future in as_completed(futures):
+                file = futures[future]
+                try:
+                    future.result()
+                    print(f"Deleted: {file.name}")
+                except Exception as e:
+                    print(f"Error deleting {file.name}: {e}")
+        with self._state_lock:
+            for file in files:
+                self.uploaded_files.pop(file.name, None)
+            self._cache_version += 1
         print("All files deleted")
 
     def list_stores(self):
@@ -174,6 +764,10 @@ class GeminiRAG:
             try:
                 self.client.file_search_stores.delete(name=self.file_search_store.name)
                 print(f"Deleted file search store: {self.file_search_store.name}")
+                # Files imported into the deleted store can no longer be skipped
+                with self._index_lock:
+                    if self._import_index.pop(self.file_search_store.name, None) is not None:
+                        self._save_import_index()
                 self.file_search_store = None
             except Exception as e:
                 print(f"Error deleting store: {e}")
@@ -181,14 +775,29 @@ class GeminiRAG:
             print("No file search store to delete")
 
 
+async def _answer_questions(rag: GeminiRAG, questions: list, max_concurrency: int = 8):
+    """Answer a batch of questions concurrently, reporting failures per question"""
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def answer(question):
+        async with semaphore:
+            return await rag.query_async(question)
+
+    results = await asyncio.gather(*[answer(q) for q in questions], return_exceptions=True)
+    for question, result in zip(questions, results):
+        if isinstance(result, Exception):
+            print(f"Error answering '{question}': {result}")
+    return results
+
+
 def main():
     """Example usage of the Gemini RAG system"""
 
     # Initialize RAG system
     rag = GeminiRAG()
 
-    # Create a file search store
-    rag.create_store("my-knowledge-base")
+    # Reuse the store from earlier runs so unchanged documents are skipped
+    rag.get_or_create_store("my-knowledge-base")
 
     # Example: Upload files from a directory
     # You can modify this to point to your documents
@@ -196,9 +805,14 @@ def main():
 
     if docs_dir.exists() and docs_dir.is_dir():
         print(f"\nFound documents directory. Uploading files...")
-        files = list(docs_dir.glob("*.txt")) + list(docs_dir.glob("*.pdf")) + list(docs_dir.glob("*.md"))
+        # Single directory pass instead of one glob per extension
+        with os.scandir(docs_dir) as entries:
+            files = sorted(
+                entry.path for entry in entries
+                if entry.is_file() and os.path.splitext(entry.name)[1].lower() in SUPPORTED_EXTENSIONS
+            )
         if files:
-            rag.upload_multiple_files([str(f) for f in files])
+            rag.upload_multiple_files(files)
         else:
             print("No supported files found in documents directory")
     else:
@@ -207,6 +821,19 @@ def main():
         print("Supported formats: .txt, .pdf, .md, and many more")
         return
 
+    # Piped input (e.g. a file of questions): answer them all concurrently
+    if not sys.stdin.isatty():
+        questions = []
+        for line in sys.stdin:
+            question = line.strip()
+            if question.lower() in ['quit', 'exit', 'q']:
+                break
+            if question:
+                questions.append(question)
+        asyncio.run(_answer_questions(rag, questions))
+        print("\nGoodbye!")
+        return
+
     # Interactive query loop
     print("\n" + "=" * 50)
     print("RAG System Ready!")